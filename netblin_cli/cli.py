@@ -61,11 +61,35 @@ def main():
         help=f"Whisper модель (по умолчанию: {WHISPER_MODEL})",
     )
 
+    parser.add_argument(
+        "--encoder",
+        default="auto",
+        help="Видеокодек FFmpeg (auto: первый доступный железный энкодер, иначе libx264)",
+    )
+
+    parser.add_argument(
+        "--whisper-backend",
+        choices=["cli", "pywhispercpp", "server", "faster-whisper"],
+        help="Бэкенд Whisper (по умолчанию: pywhispercpp если установлен, иначе cli)",
+    )
+
+    parser.add_argument(
+        "--whisper-threads",
+        type=int,
+        help="Потоки whisper.cpp (по умолчанию: все ядра)",
+    )
+
     parser.add_argument(
         "-l", "--lang",
         help="Язык видео (ru, en, etc). Автодетекция если не указан",
     )
 
+    parser.add_argument(
+        "--vad",
+        action="store_true",
+        help="Вырезать тишину перед транскрипцией (Silero VAD)",
+    )
+
     parser.add_argument(
         "--dry-run",
         action="store_true",
@@ -116,7 +140,10 @@ def main():
         image_path=image_path,
         voice=args.voice,
         whisper_model=args.whisper_model,
+        whisper_threads=args.whisper_threads,
+        whisper_backend=args.whisper_backend,
         ollama_model=args.model,
+        encoder=args.encoder,
         keep_temp=args.keep_temp,
     )
 
@@ -127,6 +154,7 @@ def main():
             video_path=video_path,
             output_path=output_path,
             language=args.lang,
+            vad=args.vad,
             dry_run=args.dry_run,
         )
 
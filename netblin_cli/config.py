@@ -12,7 +12,8 @@ OLLAMA_URL = "http://localhost:11434"
 OLLAMA_MODEL = "dolphin3"
 
 # Whisper
-WHISPER_MODEL = "large-v3"
+# turbo: почти то же качество, что large-v3, но в разы быстрее
+WHISPER_MODEL = "large-v3-turbo"
 
 # TTS
 DEFAULT_VOICE = "aidar"
@@ -20,8 +21,9 @@ DEFAULT_VOICE = "aidar"
 # FFmpeg
 FONT_PATH = "/System/Library/Fonts/Supplemental/Arial.ttf"  # macOS default
 
-# Промпт для LLM
-LLM_PROMPT = """Задача: разбей транскрипцию на фразы и придумай антонимы.
+# Промпты для LLM. Правила уходят в system — Ollama держит их KV-кэш
+# между батчами, в user попадает только транскрипция
+LLM_SYSTEM_PROMPT = """Задача: разбей транскрипцию на фразы и придумай антонимы.
 
 Правила:
 1. Разбей на фразы по 2-5 слов по смыслу
@@ -32,9 +34,9 @@ LLM_PROMPT = """Задача: разбей транскрипцию на фра
 КРИТИЧНО: Ответ ТОЛЬКО JSON массив. Никакого текста до или после.
 
 Пример ответа:
-[{{"original":"привет друзья","antonym":"пока враги","start":0.0,"end":0.8}},{{"original":"сегодня","antonym":"вчера","start":0.9,"end":1.2}}]
+[{"original":"привет друзья","antonym":"пока враги","start":0.0,"end":0.8},{"original":"сегодня","antonym":"вчера","start":0.9,"end":1.2}]"""
 
-Транскрипция:
+LLM_USER_PROMPT = """Транскрипция:
 {transcription}
 
 JSON:"""
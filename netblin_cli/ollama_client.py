@@ -1,14 +1,25 @@
 """Клиент для Ollama API."""
 
-import json
+import asyncio
+import os
+import re
+
+import httpx
+import orjson
 import requests
 from dataclasses import dataclass
 from rich.console import Console
 
-from .config import OLLAMA_URL, OLLAMA_MODEL
+from .config import OLLAMA_URL, OLLAMA_MODEL, LLM_SYSTEM_PROMPT, LLM_USER_PROMPT
 
 console = Console()
 
+# Сколько сегментов отправляем в LLM одним запросом
+CHUNK_SIZE = 30
+
+# Префиксы, которые LLM любит добавлять перед ответом
+_PREFIX_RE = re.compile(r"^(?:противоположность|антоним|ответ)\s*:\s*", re.IGNORECASE)
+
 
 @dataclass
 class ReactionSegment:
@@ -19,6 +30,58 @@ class ReactionSegment:
     end: float
 
 
+class _ArrayStreamParser:
+    """Инкрементальный парсер JSON массива из потока токенов LLM.
+
+    Копит символы и отдаёт каждый объект верхнего уровня, как только
+    увидена его закрывающая скобка — не дожидаясь конца массива.
+    """
+
+    def __init__(self):
+        self._buf: list[str] = []
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+
+    def feed(self, piece: str) -> list[dict]:
+        """Скармливает кусок текста, возвращает завершённые объекты."""
+        items = []
+
+        for ch in piece:
+            if self._depth == 0:
+                # Ждём начала следующего объекта, мусор между ними игнорируем
+                if ch == "{":
+                    self._depth = 1
+                    self._buf = ["{"]
+                continue
+
+            self._buf.append(ch)
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                continue
+
+            if ch == '"':
+                self._in_string = True
+            elif ch == "{":
+                self._depth += 1
+            elif ch == "}":
+                self._depth -= 1
+                if self._depth == 0:
+                    try:
+                        items.append(orjson.loads("".join(self._buf)))
+                    except orjson.JSONDecodeError:
+                        pass
+                    self._buf = []
+
+        return items
+
+
 class OllamaClient:
     """Клиент для работы с Ollama."""
 
@@ -26,16 +89,39 @@ class OllamaClient:
         self.model = model
         self.url = url
         self.api_generate = f"{url}/api/generate"
+        self.api_chat = f"{url}/api/chat"
+        # Сколько запросов Ollama обрабатывает параллельно (OLLAMA_NUM_PARALLEL)
+        self.num_parallel = int(os.getenv("OLLAMA_NUM_PARALLEL", "4"))
+        self._aclient: httpx.AsyncClient | None = None
+
+        # Кэш антонимов: повторяющиеся фразы не гоняем в LLM заново
+        self._antonym_cache: dict[str, str] = {}
+
+        # Переиспользуем TCP соединение между запросами (keep-alive)
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=16, pool_maxsize=16)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def close(self):
+        """Закрывает пул соединений."""
+        self.session.close()
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
 
     def check_connection(self) -> bool:
         """Проверяет доступность Ollama."""
         try:
-            resp = requests.get(f"{self.url}/api/tags", timeout=5)
+            resp = self.session.get(f"{self.url}/api/tags", timeout=5)
             return resp.status_code == 200
         except requests.exceptions.RequestException:
             return False
 
-    def generate(self, prompt: str) -> str:
+    def generate(self, prompt: str, num_predict: int = 100, timeout: int = 60) -> str:
         """Генерирует ответ от LLM."""
         payload = {
             "model": self.model,
@@ -43,17 +129,22 @@ class OllamaClient:
             "stream": False,
             "options": {
                 "temperature": 0.8,
-                "num_predict": 100,  # Короткий ответ
+                "num_predict": num_predict,
             }
         }
 
-        resp = requests.post(self.api_generate, json=payload, timeout=60)
+        resp = self.session.post(self.api_generate, json=payload, timeout=timeout)
         resp.raise_for_status()
 
         return resp.json().get("response", "").strip()
 
     def generate_antonym(self, text: str) -> str:
         """Генерирует антоним/противоположность для фразы."""
+        cache_key = text.strip().lower()
+        cached = self._antonym_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
         prompt = f"""Переверни смысл фразы на противоположный. Сохрани структуру но замени ключевые слова на антонимы.
 
 Примеры:
@@ -68,46 +159,164 @@ class OllamaClient:
 
         response = self.generate(prompt)
 
-        # Очищаем ответ
-        response = response.strip().strip('"').strip("'")
-        # Убираем возможные префиксы
-        for prefix in ["Противоположность:", "Антоним:", "Ответ:"]:
-            if response.lower().startswith(prefix.lower()):
-                response = response[len(prefix):].strip()
+        # Очищаем ответ: кавычки и возможный префикс — одним проходом
+        response = response.strip().strip("'\"")
+        response = _PREFIX_RE.sub("", response, count=1).strip()
 
         # Если ответ слишком длинный или пустой
         if not response or len(response) > len(text) * 3:
-            return "совсем наоборот"
+            response = "совсем наоборот"
 
+        self._antonym_cache[cache_key] = response
         return response
 
-    def process_segments(self, segments: list) -> list[ReactionSegment]:
-        """Обрабатывает сегменты и генерирует антонимы для каждого."""
+    def process_segments(self, transcript) -> list[ReactionSegment]:
+        """Обрабатывает транскрипцию целиком (см. iter_segments)."""
+        return list(self.iter_segments(transcript))
+
+    def iter_segments(self, transcript):
+        """Стримит ReactionSegment'ы по мере генерации LLM.
+
+        Ollama отвечает потоком токенов; каждый сегмент отдаётся сразу,
+        как только его JSON объект допарсился — потребитель (TTS, рендер)
+        может начинать работу, не дожидаясь конца ответа. Порядок
+        хронологический: следующие батчи генерируются в фоне.
+
+        Принимает TranscriptResult (читаем колонки напрямую) или список
+        Segment.
+        """
         console.print(f"[cyan]Модель:[/cyan] {self.model}")
 
-        results = []
+        if hasattr(transcript, "to_dicts"):
+            seg_dicts = transcript.to_dicts()
+        else:
+            seg_dicts = [s.to_dict() for s in transcript]
+
+        # Одним запросом отправляем пачку сегментов — вместо N HTTP вызовов
+        chunks = [seg_dicts[i:i + CHUNK_SIZE] for i in range(0, len(seg_dicts), CHUNK_SIZE)]
+
+        agen = self._aiter_segments(chunks)
+        loop = asyncio.new_event_loop()
+        try:
+            while True:
+                try:
+                    yield loop.run_until_complete(agen.__anext__())
+                except StopAsyncIteration:
+                    break
+        finally:
+            loop.run_until_complete(loop.shutdown_asyncgens())
+            loop.close()
+
+    async def _aiter_segments(self, chunks: list):
+        """Стримит сегменты всех батчей, ограничиваясь num_parallel запросами."""
+        sem = asyncio.Semaphore(self.num_parallel)
+        self._aclient = httpx.AsyncClient(timeout=300)
+
+        # У каждого батча своя очередь: читаем их по порядку, пока
+        # остальные батчи наполняются в фоне
+        queues: list[asyncio.Queue] = [asyncio.Queue() for _ in chunks]
+        done_marker = object()
 
-        from rich.progress import Progress, SpinnerColumn, TextColumn, BarColumn, TaskProgressColumn
+        async def run_chunk(chunk: list, queue: asyncio.Queue):
+            try:
+                async with sem:
+                    count = await self._stream_chunk(chunk, queue)
+                if count == 0:
+                    # LLM не вернул валидный JSON — пофразовый фоллбэк
+                    for seg in await asyncio.to_thread(self._fallback_segments, chunk):
+                        queue.put_nowait(seg)
+            finally:
+                queue.put_nowait(done_marker)
 
-        with Progress(
-            SpinnerColumn(),
-            TextColumn("[progress.description]{task.description}"),
-            BarColumn(),
-            TaskProgressColumn(),
-            console=console,
-        ) as progress:
-            task = progress.add_task("Генерация антонимов", total=len(segments))
+        tasks = [
+            asyncio.create_task(run_chunk(chunk, queue))
+            for chunk, queue in zip(chunks, queues)
+        ]
+
+        try:
+            for queue in queues:
+                while True:
+                    item = await queue.get()
+                    if item is done_marker:
+                        break
+                    yield item
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await self._aclient.aclose()
+            self._aclient = None
+
+    async def _stream_chunk(self, chunk: list, queue: asyncio.Queue) -> int:
+        """Стримит один батч в очередь; возвращает число сегментов."""
+        # /api/chat: статичные правила в system остаются в KV-кэше
+        # сервера между батчами, keep_alive не даёт выгрузить модель
+        payload = {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": LLM_SYSTEM_PROMPT},
+                {
+                    "role": "user",
+                    "content": LLM_USER_PROMPT.format(
+                        transcription=orjson.dumps(chunk).decode()
+                    ),
+                },
+            ],
+            "stream": True,
+            "keep_alive": "30m",
+            "options": {
+                "temperature": 0.8,
+                # Без лимита: плотный батч легко даёт 2-5k токенов, а
+                # обрезанный по длине ответ стримящий парсер глотает
+                # молча — хвост сегментов просто исчезает
+                "num_predict": -1,
+            }
+        }
 
-            for seg in segments:
-                antonym = self.generate_antonym(seg.text)
+        parser = _ArrayStreamParser()
+        count = 0
 
-                results.append(ReactionSegment(
-                    original=seg.text,
-                    antonym=f"Нет блин, {antonym.lower()}",
-                    start=seg.start,
-                    end=seg.end,
-                ))
+        async with self._aclient.stream("POST", self.api_chat, json=payload) as resp:
+            resp.raise_for_status()
+            async for line in resp.aiter_lines():
+                if not line.strip():
+                    continue
+                data = orjson.loads(line)
+                if data.get("done") and data.get("done_reason") == "length":
+                    # Страховка: если лимит всё же сработал (num_ctx и
+                    # т.п.), не теряем хвост молча
+                    console.print(
+                        "[yellow]Ответ LLM обрезан по длине — "
+                        "часть сегментов батча потеряна[/yellow]"
+                    )
+                piece = data.get("message", {}).get("content", "")
+                for item in parser.feed(piece):
+                    if not all(key in item for key in ("original", "antonym", "start", "end")):
+                        continue
+                    try:
+                        segment = ReactionSegment(
+                            original=str(item["original"]),
+                            antonym=f"Нет блин, {str(item['antonym']).lower()}",
+                            start=float(item["start"]),
+                            end=float(item["end"]),
+                        )
+                    except (ValueError, TypeError):
+                        # LLM положил в таймкод не число ("0:01", null) —
+                        # пропускаем элемент, как и при битых ключах
+                        continue
+                    queue.put_nowait(segment)
+                    count += 1
 
-                progress.advance(task)
+        return count
 
-        return results
+    def _fallback_segments(self, chunk: list) -> list[ReactionSegment]:
+        """Пофразовая генерация для батча, который не распарсился."""
+        return [
+            ReactionSegment(
+                original=seg["text"],
+                antonym=f"Нет блин, {self.generate_antonym(seg['text']).lower()}",
+                start=seg["start"],
+                end=seg["end"],
+            )
+            for seg in chunk
+        ]
@@ -1,5 +1,8 @@
 """Главный пайплайн обработки видео."""
 
+import hashlib
+import os
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from rich.console import Console
 from rich.progress import Progress, SpinnerColumn, TextColumn, BarColumn, TaskProgressColumn
@@ -21,7 +24,10 @@ class Pipeline:
         image_path: Path = DEFAULT_IMAGE,
         voice: str = DEFAULT_VOICE,
         whisper_model: str = WHISPER_MODEL,
+        whisper_threads: int | None = None,
+        whisper_backend: str | None = None,
         ollama_model: str = OLLAMA_MODEL,
+        encoder: str = "auto",
         keep_temp: bool = False,
     ):
         self.image_path = image_path
@@ -31,25 +37,27 @@ class Pipeline:
         self.keep_temp = keep_temp
 
         # Инициализируем компоненты
-        self.transcriber = Transcriber(model=whisper_model)
+        self.transcriber = Transcriber(
+            model=whisper_model,
+            threads=whisper_threads,
+            backend=whisper_backend,
+        )
         self.ollama = OllamaClient(model=ollama_model)
         self.tts = TTSEngine(voice=voice)
-        self.video_processor = VideoProcessor(TEMP_DIR)
+        self.video_processor = VideoProcessor(TEMP_DIR, encoder=encoder)
 
     def run(
         self,
         video_path: Path,
         output_path: Path | None = None,
         language: str | None = None,
+        vad: bool = False,
         dry_run: bool = False,
     ) -> Path | None:
-        """Запускает полный пайплайн."""
-        video_path = Path(video_path)
-
-        if not video_path.exists():
-            console.print(f"[red]Файл не найден:[/red] {video_path}")
-            return None
+        """Запускает полный пайплайн.
 
+        video_path уже проверен в cli.main — здесь не делаем лишних stat.
+        """
         if output_path is None:
             output_path = video_path.with_name(f"{video_path.stem}_reaction.mp4")
 
@@ -75,101 +83,119 @@ class Pipeline:
             console.print(f"   Длительность: {video_info.duration:.1f}s")
             console.print()
 
-            # 2. Извлекаем аудио
-            console.print("[bold]2. Извлечение аудио[/bold]")
-            audio_path = TEMP_DIR / "audio.wav"
-            self.video_processor.extract_audio(video_path, audio_path)
-            console.print(f"   [green]✓[/green] {audio_path}")
-            console.print()
-
-            # 3. Транскрипция
-            console.print("[bold]3. Транскрипция[/bold]")
-            transcript = self.transcriber.transcribe(audio_path, language=language)
+            # 2. Транскрипция (аудио уходит в Whisper потоком из ffmpeg,
+            # без промежуточного WAV на диске)
+            console.print("[bold]2. Транскрипция[/bold]")
+            transcript = self.transcriber.transcribe_video(video_path, language=language, vad=vad)
             console.print(f"   [green]✓[/green] Язык: {transcript.language}")
-            console.print(f"   [green]✓[/green] Сегментов: {len(transcript.segments)}")
-            console.print()
-
-            # 4. LLM обработка
-            console.print("[bold]4. Генерация антонимов[/bold]")
-            segments = self.ollama.process_segments(transcript.segments)
-            console.print(f"   [green]✓[/green] Сегментов: {len(segments)}")
+            console.print(f"   [green]✓[/green] Сегментов: {len(transcript)}")
             console.print()
 
-            # Показываем превью
-            console.print("[bold]Превью сегментов:[/bold]")
-            for i, seg in enumerate(segments[:5]):
-                console.print(f"   {i+1}. \"{seg.original}\" → \"{seg.antonym}\"")
-            if len(segments) > 5:
-                console.print(f"   ... и ещё {len(segments) - 5}")
-            console.print()
-
-            if dry_run:
-                console.print("[yellow]Dry run — остановка[/yellow]")
-                return None
-
-            # 5. Генерация TTS
-            console.print("[bold]5. Генерация голоса[/bold]")
-            audio_files = []
-            with Progress(
-                SpinnerColumn(),
-                TextColumn("[progress.description]{task.description}"),
-                BarColumn(),
-                TaskProgressColumn(),
-                console=console,
-            ) as progress:
-                task = progress.add_task("TTS", total=len(segments))
-                for i, seg in enumerate(segments):
-                    audio_file = TEMP_DIR / f"tts_{i:03d}.mp3"
-                    # generate возвращает реальный путь (может быть .wav для Silero)
-                    actual_path = self.tts.generate(seg.antonym, audio_file)
-                    audio_files.append(actual_path)
-                    progress.advance(task)
-            console.print(f"   [green]✓[/green] Создано {len(audio_files)} аудио")
-            console.print()
-
-            # 6. Сборка видео
-            console.print("[bold]6. Сборка видео[/bold]")
-            all_clips = []
-
-            with Progress(
-                SpinnerColumn(),
-                TextColumn("[progress.description]{task.description}"),
-                BarColumn(),
-                TaskProgressColumn(),
-                console=console,
-            ) as progress:
-                task = progress.add_task("Сборка", total=len(segments))
-
-                for i, seg in enumerate(segments):
-                    # Пропускаем сегменты с невалидными таймкодами
-                    if seg.start <= 0 and seg.end <= 0:
-                        continue
-
-                    # Вырезаем оригинальный клип
-                    original_clip = TEMP_DIR / f"orig_{i:03d}.mp4"
-                    self.video_processor.cut_video(
-                        video_path, seg.start, seg.end, original_clip
-                    )
-                    all_clips.append(original_clip)
-
-                    # Создаём reaction клип
-                    reaction_clip = TEMP_DIR / f"react_{i:03d}.mp4"
-                    self.video_processor.create_reaction_clip(
-                        self.image_path,
-                        audio_files[i],
-                        seg.antonym,
-                        video_info,
-                        reaction_clip,
-                    )
-                    all_clips.append(reaction_clip)
-
-                    progress.advance(task)
-
+            # 3. LLM обработка: TTS и рендер стартуют по мере стрима
+            console.print("[bold]3. Генерация антонимов (+ озвучка и рендер внахлёст)[/bold]")
+            # Конвейер: как только LLM отдал сегмент — запускается его
+            # озвучка; как только готова озвучка — режется оригинал и
+            # рендерится reaction клип. Все три стадии идут одновременно
+            # для разных сегментов, в конце остаётся дешёвая склейка.
+            segments = []
+            # Одинаковые антонимы (повторы, филлеры) озвучиваем один раз
+            tts_cache: dict[str, object] = {}
+            render_futures: dict[int, object] = {}
+            tts_executor = ThreadPoolExecutor(max_workers=min(8, os.cpu_count() or 1))
+            render_executor = ThreadPoolExecutor(
+                max_workers=max(2, (os.cpu_count() or 4) // 2)
+            )
+
+            def render_segment(i, seg, tts_future):
+                """Дожидается озвучки и собирает пару клипов сегмента."""
+                audio_path = tts_future.result()
+                if seg.start <= 0 and seg.end <= 0:
+                    # Невалидные таймкоды — сегмент пропускаем
+                    return None, None
+
+                orig_clip = self.video_processor.cut_video(
+                    video_path, seg.start, seg.end,
+                    TEMP_DIR / f"orig_{i:03d}.mp4",
+                    fast=False,  # точные границы, кодеки едины для склейки
+                )
+                caption = self.video_processor.render_caption(
+                    seg.antonym, video_info, TEMP_DIR / f"text_{i:03d}.png"
+                )
+                react_clip = self.video_processor.create_reaction_clip(
+                    self.image_path, audio_path, seg.antonym, video_info,
+                    TEMP_DIR / f"react_{i:03d}.mp4", caption, threads=4,
+                )
+                return orig_clip, react_clip
+
+            try:
+                with Progress(
+                    SpinnerColumn(),
+                    TextColumn("[progress.description]{task.description}"),
+                    BarColumn(),
+                    TaskProgressColumn(),
+                    console=console,
+                ) as progress:
+                    task = progress.add_task("Генерация антонимов", total=None)
+                    for seg in self.ollama.iter_segments(transcript):
+                        i = len(segments)
+                        segments.append(seg)
+                        if not dry_run:
+                            text_hash = hashlib.blake2b(
+                                seg.antonym.encode(), digest_size=16
+                            ).hexdigest()
+                            future = tts_cache.get(text_hash)
+                            if future is None:
+                                future = tts_executor.submit(
+                                    self.tts.generate, seg.antonym, TEMP_DIR / f"tts_{i:03d}.mp3"
+                                )
+                                tts_cache[text_hash] = future
+                            render_futures[i] = render_executor.submit(
+                                render_segment, i, seg, future
+                            )
+                        progress.advance(task)
+                console.print(f"   [green]✓[/green] Сегментов: {len(segments)}")
+                console.print()
+
+                # Показываем превью
+                console.print("[bold]Превью сегментов:[/bold]")
+                for i, seg in enumerate(segments[:5]):
+                    console.print(f"   {i+1}. \"{seg.original}\" → \"{seg.antonym}\"")
+                if len(segments) > 5:
+                    console.print(f"   ... и ещё {len(segments) - 5}")
+                console.print()
+
+                if dry_run:
+                    console.print("[yellow]Dry run — остановка[/yellow]")
+                    return None
+
+                # 4. Дожидаемся уже запущенных рендеров
+                console.print("[bold]4. Рендер сегментов[/bold]")
+                all_clips = []
+                with Progress(
+                    SpinnerColumn(),
+                    TextColumn("[progress.description]{task.description}"),
+                    BarColumn(),
+                    TaskProgressColumn(),
+                    console=console,
+                ) as progress:
+                    task = progress.add_task("Рендер", total=len(render_futures))
+                    for i in range(len(segments)):
+                        orig_clip, react_clip = render_futures[i].result()
+                        if orig_clip is not None:
+                            all_clips += [orig_clip, react_clip]
+                        progress.advance(task)
+            finally:
+                # cancel_futures: при ошибке не даём ещё не начатым
+                # задачам стартовать — cleanup() уже сносит temp/, и
+                # выход не зависает на доживающих воркерах
+                tts_executor.shutdown(wait=False, cancel_futures=True)
+                render_executor.shutdown(wait=False, cancel_futures=True)
             console.print(f"   [green]✓[/green] Создано {len(all_clips)} клипов")
             console.print()
 
-            # 7. Финальная склейка
-            console.print("[bold]7. Финальная склейка[/bold]")
+            # 5. Финальная склейка — клипы с одинаковыми кодеками
+            # склеиваются stream-copy, без перекодирования
+            console.print("[bold]5. Финальная склейка[/bold]")
             with console.status("[green]Склеиваю..."):
                 self.video_processor.concat_videos(all_clips, output_path)
             console.print(f"   [green]✓[/green] {output_path}")
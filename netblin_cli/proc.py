@@ -0,0 +1,35 @@
+"""Запуск внешних процессов с большими буферами пайпов."""
+
+import subprocess
+
+# ffmpeg и whisper.cpp пишут десятки килобайт прогресса и JSON в
+# stdout/stderr; с дефолтным мелким буфером это лишние syscall'ы на
+# чтение и риск блокировки ребёнка на переполненном пайпе
+PIPE_BUF_SIZE = 65536
+
+
+def run(
+    cmd: list[str],
+    text: bool = False,
+    check: bool = False,
+    timeout: float | None = None,
+) -> subprocess.CompletedProcess:
+    """Аналог subprocess.run(capture_output=True) с 64K буфером чтения."""
+    proc = subprocess.Popen(
+        cmd,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        bufsize=PIPE_BUF_SIZE,
+        text=text,
+    )
+    try:
+        stdout, stderr = proc.communicate(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        proc.communicate()
+        raise
+
+    result = subprocess.CompletedProcess(cmd, proc.returncode, stdout, stderr)
+    if check:
+        result.check_returncode()
+    return result
@@ -1,17 +1,36 @@
 """Whisper транскрипция через whisper.cpp (быстрая нативная версия)."""
 
-import json
+import hashlib
+import os
+import socket
 import subprocess
+import tempfile
+import time
 from pathlib import Path
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+
+import numpy as np
+import orjson
+import requests
 from rich.console import Console
 
+from . import proc
+from .config import TEMP_DIR
+
 console = Console()
 
 # whisper.cpp пути
 WHISPER_CPP_PATH = Path.home() / "whisper.cpp"
 WHISPER_BIN = WHISPER_CPP_PATH / "build" / "bin" / "whisper-cli"
-WHISPER_MODEL = WHISPER_CPP_PATH / "models" / "ggml-large-v3.bin"
+WHISPER_SERVER_BIN = WHISPER_CPP_PATH / "build" / "bin" / "whisper-server"
+WHISPER_MODELS_DIR = WHISPER_CPP_PATH / "models"
+
+# 16kHz моно PCM — формат, который ест Whisper
+_FFMPEG_PCM_ARGS = ["-vn", "-acodec", "pcm_s16le", "-ar", "16000", "-ac", "1"]
+
+# Кэш транскрипций живёт вне TEMP_DIR — ту директорию пайплайн сносит
+# в конце каждого прогона, а кэш нужен как раз между прогонами
+TRANSCRIPT_CACHE_DIR = Path.home() / ".cache" / "netblin" / "transcripts"
 
 
 @dataclass
@@ -27,100 +46,662 @@ class Segment:
 
 @dataclass
 class TranscriptResult:
-    """Результат транскрипции."""
+    """Результат транскрипции.
+
+    Сегменты хранятся колонками (SoA): список текстов плюс два numpy
+    массива таймкодов — тысячи мелких Python объектов не создаём.
+    """
     text: str
     language: str
-    segments: list[Segment]
+    texts: list[str] = field(default_factory=list)
+    starts: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=np.float32))
+    ends: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=np.float32))
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    def to_dicts(self) -> list[dict]:
+        """Сегменты как список словарей."""
+        return [
+            {"text": t, "start": float(s), "end": float(e)}
+            for t, s, e in zip(self.texts, self.starts, self.ends)
+        ]
+
+    @property
+    def segments(self) -> list[Segment]:
+        """Материализует список Segment (для совместимости)."""
+        return [
+            Segment(t, float(s), float(e))
+            for t, s, e in zip(self.texts, self.starts, self.ends)
+        ]
 
     def to_json(self) -> str:
-        """Возвращает JSON для LLM."""
-        return json.dumps(
-            [s.to_dict() for s in self.segments],
-            ensure_ascii=False,
-            indent=2
-        )
+        """Возвращает JSON для LLM.
+
+        Компактный, без отступов: время обработки промпта у Ollama
+        линейно по токенам, а примеры в LLM_PROMPT и так компактные.
+        """
+        return orjson.dumps(self.to_dicts()).decode()
 
 
 class Transcriber:
     """Whisper транскрибер через whisper.cpp."""
 
-    def __init__(self, model: str = "large-v3"):
+    def __init__(
+        self,
+        model: str = "large-v3-turbo",
+        threads: int | None = None,
+        backend: str | None = None,
+    ):
         self.model = model
+        # По умолчанию отдаём whisper.cpp все ядра вместо его дефолтных 4
+        self.threads = threads if threads else (os.cpu_count() or 4)
 
-        if not WHISPER_BIN.exists():
-            raise FileNotFoundError(
-                f"whisper.cpp не найден: {WHISPER_BIN}\n"
-                "Установи: https://github.com/ggerganov/whisper.cpp"
-            )
+        # Бэкенды:
+        # - pywhispercpp: in-process биндинг whisper.cpp (авто, если установлен)
+        # - server: долгоживущий процесс whisper-server
+        # - cli: холодный whisper-cli на каждый вызов
+        # - faster-whisper: CTranslate2 с int8 квантованием (не-Apple железо)
+        if backend is None:
+            try:
+                import pywhispercpp  # noqa: F401
+                backend = "pywhispercpp"
+            except ImportError:
+                backend = "cli"
+        self.backend = backend
 
-        if not WHISPER_MODEL.exists():
-            raise FileNotFoundError(
-                f"Модель не найдена: {WHISPER_MODEL}\n"
-                "Скачай: cd ~/whisper.cpp && ./models/download-ggml-model.sh large-v3"
-            )
+        if backend == "faster-whisper":
+            # Модель качается по имени, whisper.cpp не нужен
+            self.model_path = None
+        else:
+            if not WHISPER_BIN.exists():
+                raise FileNotFoundError(
+                    f"whisper.cpp не найден: {WHISPER_BIN}\n"
+                    "Установи: https://github.com/ggerganov/whisper.cpp"
+                )
+            self.model_path = self._resolve_model(model)
+
+        self._model = None
+        self._server: subprocess.Popen | None = None
+        self._server_url: str | None = None
+
+    def close(self):
+        """Останавливает whisper-server, если он был запущен."""
+        if self._server is not None:
+            self._server.terminate()
+            try:
+                self._server.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self._server.kill()
+            self._server = None
+            self._server_url = None
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
+
+    def _resolve_model(self, model: str) -> Path:
+        """Находит ggml файл для запрошенной модели."""
+        model_path = WHISPER_MODELS_DIR / f"ggml-{model}.bin"
+        if model_path.exists():
+            return model_path
+
+        # Модели нет — пробуем старый large-v3, если он уже скачан
+        fallback = WHISPER_MODELS_DIR / "ggml-large-v3.bin"
+        if fallback.exists():
+            console.print(f"[yellow]Модель {model} не найдена, использую large-v3[/yellow]")
+            self.model = "large-v3"
+            return fallback
+
+        raise FileNotFoundError(
+            f"Модель не найдена: {model_path}\n"
+            f"Скачай: cd ~/whisper.cpp && ./models/download-ggml-model.sh {model}"
+        )
+
+    def _cache_path(
+        self,
+        audio_path: Path,
+        language: str | None,
+        vad: bool = False,
+        words: bool = False,
+    ) -> Path:
+        """Путь к кэшу транскрипции по хэшу содержимого аудио."""
+        hasher = hashlib.blake2b(digest_size=16)
+        with open(audio_path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                hasher.update(block)
+
+        suffix = ("_vad" if vad else "") + ("_words" if words else "")
+        TRANSCRIPT_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        return TRANSCRIPT_CACHE_DIR / f"transcript_{hasher.hexdigest()}_{self.model}_{language or 'auto'}{suffix}.json"
+
+    def _vad_trim(self, audio_path: Path) -> tuple[Path, list[tuple[float, float]]]:
+        """Вырезает тишину через Silero VAD.
+
+        Возвращает путь к обрезанному wav и таблицу смещений
+        (начало в обрезанном аудио, начало в оригинале) для обратного
+        пересчёта таймкодов.
+        """
+        import torch
+
+        model, utils = torch.hub.load(
+            repo_or_dir="snakers4/silero-vad",
+            model="silero_vad",
+            trust_repo=True,
+        )
+        get_speech_timestamps, save_audio, read_audio, _, _ = utils
+
+        sample_rate = 16000
+        wav = read_audio(str(audio_path), sampling_rate=sample_rate)
+        speech = get_speech_timestamps(wav, model, sampling_rate=sample_rate)
+
+        if not speech:
+            return audio_path, []
+
+        pieces = []
+        offsets = []
+        pos = 0.0
+        for ts in speech:
+            offsets.append((pos, ts["start"] / sample_rate))
+            pieces.append(wav[ts["start"]:ts["end"]])
+            pos += (ts["end"] - ts["start"]) / sample_rate
+
+        trimmed_path = audio_path.with_name(f"{audio_path.stem}_vad.wav")
+        save_audio(str(trimmed_path), torch.cat(pieces), sampling_rate=sample_rate)
 
-    def transcribe(self, audio_path: Path, language: str | None = None) -> TranscriptResult:
-        """Транскрибирует аудио и возвращает сегменты."""
+        return trimmed_path, offsets
+
+    @staticmethod
+    def _remap_times(
+        offsets: list[tuple[float, float]], times: np.ndarray
+    ) -> np.ndarray:
+        """Переводит таймкоды из обрезанного аудио обратно в оригинальные.
+
+        Для каждого времени ищем свой кусок речи searchsorted'ом по всей
+        колонке сразу — вместо питоньего цикла по сегментам и смещениям.
+        """
+        trimmed_starts = np.asarray([o[0] for o in offsets], dtype=np.float64)
+        orig_starts = np.asarray([o[1] for o in offsets], dtype=np.float64)
+
+        idx = np.searchsorted(trimmed_starts, times, side="right") - 1
+        before_first = idx < 0
+        idx = np.maximum(idx, 0)
+
+        remapped = orig_starts[idx] + (times - trimmed_starts[idx])
+        # Времена до первого куска речи остаются как есть
+        return np.where(before_first, times, remapped)
+
+    def _load_cache(self, cache_path: Path) -> TranscriptResult:
+        """Читает TranscriptResult из кэша."""
+        data = orjson.loads(cache_path.read_bytes())
+
+        return TranscriptResult(
+            text=data["text"],
+            language=data["language"],
+            texts=[seg["text"] for seg in data["segments"]],
+            starts=np.asarray([seg["start"] for seg in data["segments"]], dtype=np.float32),
+            ends=np.asarray([seg["end"] for seg in data["segments"]], dtype=np.float32),
+        )
+
+    def _save_cache(self, cache_path: Path, result: TranscriptResult):
+        """Сохраняет TranscriptResult в кэш."""
+        data = {
+            "text": result.text,
+            "language": result.language,
+            "segments": result.to_dicts(),
+        }
+        cache_path.write_bytes(orjson.dumps(data))
+
+    def transcribe(
+        self,
+        audio_path: Path,
+        language: str | None = None,
+        vad: bool = False,
+        words: bool = False,
+    ) -> TranscriptResult:
+        """Транскрибирует аудио и возвращает сегменты.
+
+        words=True даёт пословные сегменты с настоящими таймкодами из
+        модели (whisper.cpp -ml 1, faster-whisper word_timestamps) —
+        не равномерную разбивку фразы.
+        """
         audio_path = Path(audio_path)
-        output_base = audio_path.with_suffix("")
-        output_json = audio_path.with_suffix(".json")
 
-        console.print(f"[cyan]Модель:[/cyan] {self.model} (whisper.cpp)")
+        # Повторный прогон того же аудио берём из кэша — Whisper самый
+        # медленный шаг пайплайна
+        cache_path = self._cache_path(audio_path, language, vad=vad, words=words)
+        if cache_path.exists():
+            console.print("[cyan]Транскрипция из кэша[/cyan]")
+            return self._load_cache(cache_path)
 
-        cmd = [
-            str(WHISPER_BIN),
-            "-m", str(WHISPER_MODEL),
-            "-f", str(audio_path),
-            "-l", language or "auto",
-            "-ml", "80",  # Короткие сегменты (макс 80 символов ~10-12 слов)
-            "-sow",  # Разбивать по словам
-            "-oj",  # output JSON
-            "-of", str(output_base),
-        ]
+        # VAD: скармливаем Whisper только речь, без тишины.
+        # У faster-whisper свой встроенный VAD — там обрезка не нужна
+        vad_offsets: list[tuple[float, float]] = []
+        if vad and self.backend != "faster-whisper":
+            with console.status("[bold green]VAD: вырезаю тишину..."):
+                audio_path, vad_offsets = self._vad_trim(audio_path)
+
+        console.print(f"[cyan]Модель:[/cyan] {self.model} ({self.backend})")
+
+        with console.status("[bold green]Транскрибирую..."):
+            if self.backend == "pywhispercpp":
+                raw_segments = self._transcribe_inprocess(audio_path, language, words)
+            elif self.backend == "server":
+                raw_segments = self._transcribe_server(audio_path, language, words)
+            elif self.backend == "faster-whisper":
+                raw_segments = self._transcribe_faster_whisper(audio_path, language, vad, words)
+            else:
+                raw_segments = self._transcribe_cli(audio_path, language, words)
+
+        result = self._build_result(raw_segments, vad_offsets)
+        self._save_cache(cache_path, result)
+        return result
+
+    def transcribe_video(
+        self,
+        video_path: Path,
+        language: str | None = None,
+        vad: bool = False,
+        words: bool = False,
+    ) -> TranscriptResult:
+        """Транскрибирует аудиодорожку видео без промежуточного WAV.
+
+        ffmpeg декодирует PCM прямо в пайп: whisper-cli читает wav из
+        stdin, pywhispercpp и faster-whisper получают numpy массив,
+        whisper-server — wav из памяти. Декодирование и транскрипция
+        идут внахлёст, диск не трогаем.
+        """
+        video_path = Path(video_path)
+
+        cache_path = self._cache_path(video_path, language, vad=vad, words=words)
+        if cache_path.exists():
+            console.print("[cyan]Транскрипция из кэша[/cyan]")
+            return self._load_cache(cache_path)
+
+        if vad and self.backend != "faster-whisper":
+            # Silero VAD работает по wav на диске — извлекаем файл и
+            # идём обычным путём
+            audio_path = TEMP_DIR / f"{video_path.stem}_audio.wav"
+            proc.run(
+                ["ffmpeg", "-y", "-i", str(video_path), *_FFMPEG_PCM_ARGS, str(audio_path)],
+                check=True,
+            )
+            return self.transcribe(audio_path, language=language, vad=vad, words=words)
+
+        console.print(f"[cyan]Модель:[/cyan] {self.model} ({self.backend})")
 
         with console.status("[bold green]Транскрибирую..."):
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
+            if self.backend == "pywhispercpp":
+                raw_segments = self._transcribe_inprocess(self._decode_pcm(video_path), language, words)
+            elif self.backend == "server":
+                raw_segments = self._transcribe_server(self._decode_wav(video_path), language, words)
+            elif self.backend == "faster-whisper":
+                raw_segments = self._transcribe_faster_whisper(
+                    self._decode_pcm(video_path), language, vad, words
+                )
+            else:
+                raw_segments = self._transcribe_cli_pipe(video_path, language, words)
+
+        result = self._build_result(raw_segments, [])
+        self._save_cache(cache_path, result)
+        return result
+
+    def _build_result(
+        self,
+        raw_segments: list[tuple[str, float, float]],
+        vad_offsets: list[tuple[float, float]],
+    ) -> TranscriptResult:
+        """Собирает TranscriptResult из сырых сегментов — сразу колонками."""
+        n = len(raw_segments)
+        texts = [text for text, _, _ in raw_segments]
+        starts = np.fromiter((s for _, s, _ in raw_segments), dtype=np.float64, count=n)
+        ends = np.fromiter((e for _, _, e in raw_segments), dtype=np.float64, count=n)
+
+        # После VAD таймкоды идут по обрезанному аудио — возвращаем их
+        # в систему координат оригинала, обе колонки разом
+        if vad_offsets:
+            starts = self._remap_times(vad_offsets, starts)
+            ends = self._remap_times(vad_offsets, ends)
+
+        return TranscriptResult(
+            # join вместо += в цикле: без N промежуточных строк
+            text=" ".join(texts),
+            language="auto",
+            texts=texts,
+            starts=starts.astype(np.float32),
+            ends=ends.astype(np.float32),
+        )
+
+    def transcribe_many(
+        self,
+        audio_paths: list[Path],
+        language: str | None = None,
+        vad: bool = False,
+    ) -> list[TranscriptResult]:
+        """Транскрибирует пачку файлов за одну загрузку модели.
+
+        С warm-бэкендами (pywhispercpp, server) модель грузится один раз
+        на всю пачку вместо холодного старта на каждый файл; cli-бэкенд
+        просто проходит файлы по очереди.
+        """
+        return [
+            self.transcribe(audio_path, language=language, vad=vad)
+            for audio_path in audio_paths
+        ]
+
+    def _decode_pcm(self, video_path: Path) -> np.ndarray:
+        """Декодирует аудиодорожку в float32 PCM через пайп ffmpeg."""
+        cmd = ["ffmpeg", "-v", "error", "-i", str(video_path), *_FFMPEG_PCM_ARGS, "-f", "s16le", "-"]
+        ff = subprocess.Popen(
+            cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            bufsize=1 << 20,
+        )
+        data, stderr = ff.communicate(timeout=600)
+        if ff.returncode != 0:
+            raise RuntimeError(f"ffmpeg ошибка: {stderr.decode(errors='replace')}")
+
+        return np.frombuffer(data, dtype=np.int16).astype(np.float32) / 32768.0
+
+    def _decode_wav(self, video_path: Path) -> bytes:
+        """Декодирует аудиодорожку в wav байты (для whisper-server)."""
+        cmd = ["ffmpeg", "-v", "error", "-i", str(video_path), *_FFMPEG_PCM_ARGS, "-f", "wav", "-"]
+        ff = subprocess.Popen(
+            cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            bufsize=1 << 20,
+        )
+        data, stderr = ff.communicate(timeout=600)
+        if ff.returncode != 0:
+            raise RuntimeError(f"ffmpeg ошибка: {stderr.decode(errors='replace')}")
+
+        return data
+
+    def _transcribe_cli_pipe(
+        self, video_path: Path, language: str | None, words: bool = False
+    ) -> list[tuple[str, float, float]]:
+        """whisper-cli читает wav из stdin, пока ffmpeg декодирует видео."""
+        with tempfile.TemporaryDirectory(prefix="whisper_") as tmp_dir:
+            output_base = Path(tmp_dir) / "out"
+            output_json = Path(tmp_dir) / "out.json"
+
+            ff_cmd = ["ffmpeg", "-v", "error", "-i", str(video_path), *_FFMPEG_PCM_ARGS, "-f", "wav", "-"]
+            whisper_cmd = [
+                str(WHISPER_BIN),
+                "-m", str(self.model_path),
+                "-f", "-",  # wav из stdin
+                "-t", str(self.threads),
+                "-l", language or "auto",
+                "-ml", "1" if words else "80",
+                "-sow",
+                "-oj",
+                "-of", str(output_base),
+            ]
+
+            ff = subprocess.Popen(
+                ff_cmd,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+                bufsize=1 << 20,
+            )
+            whisper = subprocess.Popen(
+                whisper_cmd,
+                stdin=ff.stdout,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.PIPE,
                 text=True,
-                timeout=600
             )
+            # Закрываем наш конец пайпа: EOF дойдёт до whisper, когда
+            # ffmpeg закончит
+            ff.stdout.close()
 
-        if result.returncode != 0:
-            raise RuntimeError(f"Whisper ошибка: {result.stderr}")
+            _, stderr = whisper.communicate(timeout=600)
+            ff.wait()
 
-        if not output_json.exists():
-            raise FileNotFoundError(f"Whisper не создал JSON: {output_json}")
+            if whisper.returncode != 0:
+                raise RuntimeError(f"Whisper ошибка: {stderr}")
 
-        with open(output_json, "r", encoding="utf-8") as f:
-            data = json.load(f)
+            if not output_json.exists():
+                raise FileNotFoundError(f"Whisper не создал JSON: {output_json}")
 
-        # Извлекаем сегменты как есть от whisper
-        segments = []
-        full_text = ""
+            data = orjson.loads(output_json.read_bytes())
 
+        return self._parse_cli_json(data)
+
+    @staticmethod
+    def _parse_cli_json(data: dict) -> list[tuple[str, float, float]]:
+        """Разбирает JSON whisper-cli в сырые сегменты."""
+        raw_segments = []
         for seg_data in data.get("transcription", []):
             text = seg_data.get("text", "").strip()
             if not text:
                 continue
 
-            full_text += text + " "
-
             # whisper.cpp даёт offsets в миллисекундах
             start_ms = seg_data.get("offsets", {}).get("from", 0)
             end_ms = seg_data.get("offsets", {}).get("to", 0)
+            raw_segments.append((text, start_ms / 1000, end_ms / 1000))
 
-            segments.append(Segment(
-                text=text,
-                start=start_ms / 1000,  # в секунды
-                end=end_ms / 1000,
-            ))
+        return raw_segments
 
-        # Удаляем временный JSON
-        output_json.unlink(missing_ok=True)
+    def _transcribe_cli(
+        self, audio_path: Path, language: str | None, words: bool = False
+    ) -> list[tuple[str, float, float]]:
+        """Транскрипция через whisper-cli (модель загружается на каждый вызов).
 
-        return TranscriptResult(
-            text=full_text.strip(),
-            language="auto",
-            segments=segments,
+        whisper-cli умеет отдавать JSON только в файл (-oj), не в stdout,
+        поэтому пишем его в собственную уникальную временную директорию:
+        никаких гонок с соседними процессами за <audio>.json и никакой
+        ручной уборки.
+        """
+        with tempfile.TemporaryDirectory(prefix="whisper_") as tmp_dir:
+            output_base = Path(tmp_dir) / "out"
+            output_json = Path(tmp_dir) / "out.json"
+
+            cmd = [
+                str(WHISPER_BIN),
+                "-m", str(self.model_path),
+                "-f", str(audio_path),
+                "-t", str(self.threads),
+                "-l", language or "auto",
+                # -ml 1 — настоящие пословные таймкоды; иначе короткие
+                # сегменты (макс 80 символов ~10-12 слов)
+                "-ml", "1" if words else "80",
+                "-sow",  # Разбивать по словам
+                "-oj",  # output JSON
+                "-of", str(output_base),
+            ]
+
+            result = proc.run(cmd, text=True, timeout=600)
+
+            if result.returncode != 0:
+                raise RuntimeError(f"Whisper ошибка: {result.stderr}")
+
+            if not output_json.exists():
+                raise FileNotFoundError(f"Whisper не создал JSON: {output_json}")
+
+            data = orjson.loads(output_json.read_bytes())
+
+        return self._parse_cli_json(data)
+
+    def _ensure_server(self):
+        """Поднимает whisper-server один раз; модель остаётся в памяти."""
+        if self._server is not None and self._server.poll() is None:
+            return
+
+        if not WHISPER_SERVER_BIN.exists():
+            raise FileNotFoundError(
+                f"whisper-server не найден: {WHISPER_SERVER_BIN}\n"
+                "Собери whisper.cpp с таргетом server"
+            )
+
+        # Свободный порт
+        with socket.socket() as s:
+            s.bind(("127.0.0.1", 0))
+            port = s.getsockname()[1]
+
+        cmd = [
+            str(WHISPER_SERVER_BIN),
+            "-m", str(self.model_path),
+            "-t", str(self.threads),
+            "--host", "127.0.0.1",
+            "--port", str(port),
+            "-ml", "80",
+            "-sow",
+        ]
+        self._server = subprocess.Popen(
+            cmd,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
         )
+        self._server_url = f"http://127.0.0.1:{port}/inference"
+
+        # Ждём, пока сервер загрузит модель
+        deadline = time.monotonic() + 120
+        while time.monotonic() < deadline:
+            if self._server.poll() is not None:
+                raise RuntimeError("whisper-server не запустился")
+            try:
+                requests.get(f"http://127.0.0.1:{port}/", timeout=1)
+                return
+            except requests.exceptions.RequestException:
+                time.sleep(0.5)
+
+        raise RuntimeError("whisper-server не ответил за 120 секунд")
+
+    def _transcribe_server(
+        self, audio: Path | bytes, language: str | None, words: bool = False
+    ) -> list[tuple[str, float, float]]:
+        """Транскрипция через долгоживущий whisper-server.
+
+        audio — путь к wav или готовые wav байты из пайпа ffmpeg.
+        """
+        if words:
+            raise RuntimeError(
+                "Пословные таймкоды не поддерживаются backend'ом server — "
+                "используй pywhispercpp, cli или faster-whisper"
+            )
+
+        self._ensure_server()
+
+        if isinstance(audio, bytes):
+            files = {"file": ("audio.wav", audio, "audio/wav")}
+        else:
+            files = {"file": open(audio, "rb")}
+
+        try:
+            resp = requests.post(
+                self._server_url,
+                files=files,
+                data={
+                    "language": language or "auto",
+                    "response_format": "verbose_json",
+                },
+                timeout=600,
+            )
+        finally:
+            if not isinstance(audio, bytes):
+                files["file"].close()
+        resp.raise_for_status()
+
+        data = orjson.loads(resp.content)
+
+        raw_segments = []
+        for seg in data.get("segments", []):
+            text = seg.get("text", "").strip()
+            if not text:
+                continue
+            raw_segments.append((text, float(seg["start"]), float(seg["end"])))
+
+        return raw_segments
+
+    def _transcribe_faster_whisper(
+        self,
+        audio: "Path | np.ndarray",
+        language: str | None,
+        vad: bool,
+        words: bool = False,
+    ) -> list[tuple[str, float, float]]:
+        """Транскрипция через faster-whisper (CTranslate2, int8).
+
+        Квантование int8_float16 вдвое уменьшает модель в памяти и
+        заметно ускоряет GEMM на CPU/GPU; рекомендуемый путь вне Apple
+        Silicon. audio — путь или float32 PCM массив.
+        """
+        from faster_whisper import WhisperModel
+
+        if self._model is None:
+            # Грузим один раз и переиспользуем между вызовами
+            self._model = WhisperModel(
+                self.model,
+                device="auto",
+                compute_type="int8_float16",
+                cpu_threads=self.threads,
+            )
+
+        segments, _info = self._model.transcribe(
+            str(audio) if isinstance(audio, Path) else audio,
+            language=language,
+            vad_filter=vad,
+            word_timestamps=words,
+            condition_on_previous_text=False,
+        )
+
+        raw_segments = []
+        for seg in segments:
+            if words:
+                # Настоящие пословные таймкоды модели
+                for word in seg.words or []:
+                    text = word.word.strip()
+                    if text:
+                        raw_segments.append((text, float(word.start), float(word.end)))
+                continue
+
+            text = seg.text.strip()
+            if not text:
+                continue
+            raw_segments.append((text, float(seg.start), float(seg.end)))
+
+        return raw_segments
+
+    def _transcribe_inprocess(
+        self, audio: "Path | np.ndarray", language: str | None, words: bool = False
+    ) -> list[tuple[str, float, float]]:
+        """Транскрипция через pywhispercpp: модель живёт в памяти процесса.
+
+        audio — путь или float32 PCM массив.
+        """
+        from pywhispercpp.model import Model
+
+        if self._model is None:
+            # Грузим один раз и переиспользуем между вызовами
+            self._model = Model(
+                str(self.model_path),
+                n_threads=self.threads,
+                max_len=80,
+                split_on_word=True,
+                print_progress=False,
+                print_realtime=False,
+            )
+
+        segments = self._model.transcribe(
+            str(audio) if isinstance(audio, Path) else audio,
+            language=language or "auto",
+            # max_len=1 + token_timestamps: сегменты становятся словами
+            # с настоящими таймкодами
+            **({"max_len": 1, "token_timestamps": True} if words else {}),
+        )
+
+        raw_segments = []
+        for seg in segments:
+            text = seg.text.strip()
+            if not text:
+                continue
+            # pywhispercpp даёт t0/t1 в сотых долях секунды
+            raw_segments.append((text, seg.t0 / 100, seg.t1 / 100))
+
+        return raw_segments
@@ -1,11 +1,24 @@
 """TTS генерация через Edge-TTS и Silero."""
 
 import asyncio
+import hashlib
+import os
+import shutil
+import tempfile
 from pathlib import Path
 from rich.console import Console
 
 console = Console()
 
+# Дисковый кэш озвучки: Edge упирается в сеть, Silero в CPU, а при
+# повторных прогонах реплики почти всегда те же
+TTS_CACHE_DIR = Path.home() / ".cache" / "netblin" / "tts"
+
+# Локальная копия Silero модели — torch.hub на каждом холодном старте
+# ходит в сеть за метаданными репозитория
+SILERO_CACHE_DIR = Path.home() / ".cache" / "netblin" / "silero"
+SILERO_MODEL_URL = "https://models.silero.ai/models/tts/ru/v4_ru.pt"
+
 # Edge-TTS голоса
 EDGE_VOICES = {
     "dmitry": "ru-RU-DmitryNeural",
@@ -43,20 +56,43 @@ class TTSEngine:
             self.voice = EDGE_VOICES.get(self.voice_alias, self.voice_alias)
 
     def _init_silero(self):
-        """Инициализация Silero модели."""
+        """Инициализация Silero модели.
+
+        .pt качается один раз в ~/.cache/netblin/silero и дальше грузится
+        напрямую через torch.package — без HTTPS round-trip'а torch.hub
+        на каждый запуск. Если локальный путь не сработал, откатываемся
+        на torch.hub.
+        """
         import torch
 
+        # Дефолт torch на CPU бывает консервативным — отдаём все ядра
+        torch.set_num_threads(os.cpu_count() or 1)
+
         self.device = torch.device("cpu")
-        self.model, _ = torch.hub.load(
-            repo_or_dir="snakers4/silero-models",
-            model="silero_tts",
-            language="ru",
-            speaker="v4_ru",
-            trust_repo=True,
-        )
-        self.model.to(self.device)
         self.sample_rate = 48000
 
+        model_path = SILERO_CACHE_DIR / "v4_ru.pt"
+        try:
+            if not model_path.exists():
+                SILERO_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+                tmp_path = model_path.with_suffix(".pt.part")
+                torch.hub.download_url_to_file(SILERO_MODEL_URL, str(tmp_path))
+                os.replace(tmp_path, model_path)
+
+            self.model = torch.package.PackageImporter(
+                str(model_path)
+            ).load_pickle("tts_models", "model")
+        except Exception as e:
+            console.print(f"[yellow]Локальная Silero модель не загрузилась ({e}), пробую torch.hub[/yellow]")
+            self.model, _ = torch.hub.load(
+                repo_or_dir="snakers4/silero-models",
+                model="silero_tts",
+                language="ru",
+                speaker="v4_ru",
+                trust_repo=True,
+            )
+        self.model.to(self.device)
+
     async def _generate_edge_async(self, text: str, output_path: Path) -> Path:
         """Edge-TTS генерация."""
         import edge_tts
@@ -67,35 +103,134 @@ class TTSEngine:
 
     def _generate_silero(self, text: str, output_path: Path) -> Path:
         """Silero генерация."""
-        audio = self.model.apply_tts(
-            text=text,
-            speaker=self.voice_alias,
-            sample_rate=self.sample_rate,
-        )
+        import torch
 
-        # Сохраняем в wav через scipy
+        # inference_mode отключает autograd-обвязку — forward дешевле
+        with torch.inference_mode():
+            audio = self.model.apply_tts(
+                text=text,
+                speaker=self.voice_alias,
+                sample_rate=self.sample_rate,
+            )
+
+        return self._write_wav(audio, output_path)
+
+    def _generate_silero_batch(self, items: list[tuple[str, Path]]) -> list[Path]:
+        """Пачка Silero генераций под одним inference_mode.
+
+        apply_tts принимает по одной строке, так что внутри всё равно
+        цикл — но autograd выключается один раз на всю пачку, а не на
+        каждый текст.
+        """
+        import torch
+
+        results = []
+        with torch.inference_mode():
+            for text, output_path in items:
+                audio = self.model.apply_tts(
+                    text=text,
+                    speaker=self.voice_alias,
+                    sample_rate=self.sample_rate,
+                )
+                results.append(self._write_wav(audio, output_path.with_suffix(".wav")))
+        return results
+
+    def _write_wav(self, audio, output_path: Path) -> Path:
+        """Сохраняет тензор Silero в wav файл."""
         import numpy as np
-        from scipy.io import wavfile
+        import soundfile as sf
 
+        # Нормализуем к int16 без лишних временных массивов:
+        # clip в заранее выделенный буфер, масштаб in-place
         audio_np = audio.numpy()
-        # Нормализуем к int16
-        audio_int16 = (audio_np * 32767).astype(np.int16)
-        wavfile.write(str(output_path), self.sample_rate, audio_int16)
+        buf = np.empty_like(audio_np)
+        np.clip(audio_np, -1.0, 1.0, out=buf)
+        buf *= 32767
+        audio_int16 = buf.astype(np.int16, copy=False)
+
+        # libsndfile пишет wav в C, без питоньего заголовочного кода scipy
+        sf.write(str(output_path), audio_int16, self.sample_rate, subtype="PCM_16")
         return output_path
 
+    def _cache_path(self, text: str, ext: str) -> Path:
+        """Путь к кэшированной озвучке по хэшу (голос, текст)."""
+        key = hashlib.blake2b(
+            f"{self.voice_alias}|{text}".encode(), digest_size=16
+        ).hexdigest()
+        return TTS_CACHE_DIR / f"{key}{ext}"
+
+    @staticmethod
+    def _store_cache(src: Path, cached: Path):
+        """Кладёт файл в кэш атомарно: tempfile + os.replace."""
+        TTS_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(dir=TTS_CACHE_DIR, suffix=cached.suffix)
+        os.close(fd)
+        shutil.copyfile(src, tmp_name)
+        os.replace(tmp_name, cached)
+
     def generate(self, text: str, output_path: Path) -> Path:
-        """Генерирует аудио из текста."""
+        """Генерирует аудио из текста.
+
+        Готовая озвучка берётся из дискового кэша — при повторном
+        прогоне тех же реплик синтез не запускается вовсе.
+        """
         if self.use_silero:
             # Silero сохраняет в wav
-            wav_path = output_path.with_suffix(".wav")
-            return self._generate_silero(text, wav_path)
+            output_path = output_path.with_suffix(".wav")
+
+        cached = self._cache_path(text, output_path.suffix)
+        if cached.exists():
+            shutil.copyfile(cached, output_path)
+            return output_path
+
+        if self.use_silero:
+            self._generate_silero(text, output_path)
         else:
-            return asyncio.run(self._generate_edge_async(text, output_path))
+            asyncio.run(self._generate_edge_async(text, output_path))
+
+        self._store_cache(output_path, cached)
+        return output_path
+
+    async def _generate_batch_async(self, items: list[tuple[str, Path]]) -> list[Path]:
+        """Генерирует пачку Edge-TTS аудио конкурентно в одном loop'е."""
+        # Больше 16 параллельных стримов Edge уже не ускоряет
+        sem = asyncio.Semaphore(16)
+
+        async def one(text: str, output_path: Path) -> Path:
+            async with sem:
+                return await self._generate_edge_async(text, output_path)
+
+        return list(await asyncio.gather(*(one(t, p) for t, p in items)))
 
     def generate_batch(self, items: list[tuple[str, Path]]) -> list[Path]:
-        """Генерирует несколько аудио файлов."""
-        results = []
-        for text, output_path in items:
-            result = self.generate(text, output_path)
-            results.append(result)
+        """Генерирует несколько аудио файлов.
+
+        Edge-TTS: один event loop и asyncio.gather на всю пачку —
+        вместо asyncio.run (новый loop + TLS handshake) на каждый текст.
+        Попадания в дисковый кэш отсеиваются до синтеза.
+        """
+        results: list[Path | None] = [None] * len(items)
+        misses = []
+
+        for idx, (text, output_path) in enumerate(items):
+            if self.use_silero:
+                output_path = output_path.with_suffix(".wav")
+            cached = self._cache_path(text, output_path.suffix)
+            if cached.exists():
+                shutil.copyfile(cached, output_path)
+                results[idx] = output_path
+            else:
+                misses.append((idx, text, output_path, cached))
+
+        if misses:
+            miss_items = [(text, path) for _, text, path, _ in misses]
+            if self.use_silero:
+                paths = self._generate_silero_batch(miss_items)
+            else:
+                paths = asyncio.run(self._generate_batch_async(miss_items))
+
+            for (idx, _, _, cached), path in zip(misses, paths):
+                self._store_cache(path, cached)
+                results[idx] = path
+
         return results
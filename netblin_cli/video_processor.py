@@ -1,11 +1,14 @@
 """Обработка видео через FFmpeg."""
 
-import subprocess
+import os
 import json
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from pathlib import Path
 from dataclasses import dataclass
 from rich.console import Console
 
+from . import proc
 from .config import FONT_PATH
 
 console = Console()
@@ -28,51 +31,113 @@ class VideoInfo:
         return self.width > self.height
 
 
+# Железные энкодеры в порядке предпочтения; vaapi намеренно не пробуем —
+# ему нужен отдельный hwupload граф фильтров
+_ENCODER_PRIORITY = ["h264_nvenc", "h264_videotoolbox", "h264_qsv", "libx264"]
+
+
+@lru_cache(maxsize=1)
+def _available_encoders() -> frozenset:
+    """Множество видео энкодеров, собранных в установленном ffmpeg."""
+    result = proc.run(["ffmpeg", "-hide_banner", "-encoders"], text=True)
+    if result.returncode != 0:
+        return frozenset()
+
+    names = set()
+    for line in result.stdout.splitlines():
+        parts = line.split()
+        # Строки энкодеров: " V....D libx264 ..." (строку легенды
+        # " V..... = Video" отсеиваем по "=")
+        if len(parts) >= 2 and parts[0].startswith("V") and parts[1] != "=":
+            names.add(parts[1])
+    return frozenset(names)
+
+
+@lru_cache(maxsize=128)
+def _probe_video(path_str: str, mtime: float, size: int) -> VideoInfo:
+    """ffprobe файла; mtime и size в ключе инвалидируют кэш при изменении."""
+    # Запрашиваем только нужные поля первого видео потока — ffprobe
+    # не сериализует мегабайты метаданных, которые мы тут же выбросим
+    cmd = [
+        "ffprobe",
+        "-v", "quiet",
+        "-print_format", "json",
+        "-select_streams", "v:0",
+        "-show_entries", "stream=width,height,r_frame_rate:format=duration",
+        path_str,
+    ]
+
+    result = proc.run(cmd, text=True)
+    data = json.loads(result.stdout)
+
+    streams = data.get("streams", [])
+    if not streams:
+        raise ValueError("Видео поток не найден")
+    video_stream = streams[0]
+
+    # Парсим fps
+    fps_str = video_stream.get("r_frame_rate", "30/1")
+    if "/" in fps_str:
+        num, den = fps_str.split("/")
+        fps = float(num) / float(den)
+    else:
+        fps = float(fps_str)
+
+    return VideoInfo(
+        width=int(video_stream.get("width", 1920)),
+        height=int(video_stream.get("height", 1080)),
+        duration=float(data.get("format", {}).get("duration", 0)),
+        fps=fps,
+    )
+
+
 class VideoProcessor:
     """Обработчик видео через FFmpeg."""
 
-    def __init__(self, temp_dir: Path):
+    def __init__(self, temp_dir: Path, encoder: str = "auto"):
         self.temp_dir = temp_dir
         self.temp_dir.mkdir(exist_ok=True)
 
+        self.encoder = self._select_encoder(encoder)
+        # Аргументы видеокодека для всех перекодирующих вызовов
+        self.video_codec_args = self._codec_args(self.encoder)
+
+    def _select_encoder(self, encoder: str) -> str:
+        """Выбирает H.264 энкодер: первый доступный железный, иначе libx264.
+
+        Один раз спрашиваем у ffmpeg список собранных энкодеров вместо
+        догадок по платформе — медиадвижок даёт кратный выигрыш против
+        x264 на том же железе.
+        """
+        if encoder != "auto":
+            return encoder
+
+        available = _available_encoders()
+        for name in _ENCODER_PRIORITY:
+            if name in available:
+                return name
+        return "libx264"
+
+    @staticmethod
+    def _codec_args(encoder: str) -> list[str]:
+        if encoder == "h264_nvenc":
+            return ["-c:v", "h264_nvenc", "-preset", "p4", "-cq", "23"]
+        if encoder == "h264_videotoolbox":
+            return ["-c:v", "h264_videotoolbox", "-b:v", "4M"]
+        if encoder == "h264_qsv":
+            return ["-c:v", "h264_qsv", "-global_quality", "23"]
+        if encoder == "libx264":
+            return ["-c:v", "libx264", "-preset", "veryfast", "-crf", "23"]
+        return ["-c:v", encoder]
+
     def get_video_info(self, video_path: Path) -> VideoInfo:
-        """Получает информацию о видео."""
-        cmd = [
-            "ffprobe",
-            "-v", "quiet",
-            "-print_format", "json",
-            "-show_streams",
-            "-show_format",
-            str(video_path)
-        ]
+        """Получает информацию о видео.
 
-        result = subprocess.run(cmd, capture_output=True, text=True)
-        data = json.loads(result.stdout)
-
-        # Ищем видео поток
-        video_stream = None
-        for stream in data.get("streams", []):
-            if stream.get("codec_type") == "video":
-                video_stream = stream
-                break
-
-        if not video_stream:
-            raise ValueError("Видео поток не найден")
-
-        # Парсим fps
-        fps_str = video_stream.get("r_frame_rate", "30/1")
-        if "/" in fps_str:
-            num, den = fps_str.split("/")
-            fps = float(num) / float(den)
-        else:
-            fps = float(fps_str)
-
-        return VideoInfo(
-            width=int(video_stream.get("width", 1920)),
-            height=int(video_stream.get("height", 1080)),
-            duration=float(data.get("format", {}).get("duration", 0)),
-            fps=fps,
-        )
+        Результат кэшируется по (путь, mtime, размер) — повторные
+        обращения к тому же файлу не запускают ffprobe заново.
+        """
+        st = Path(video_path).stat()
+        return _probe_video(str(video_path), st.st_mtime, st.st_size)
 
     def extract_audio(self, video_path: Path, output_path: Path) -> Path:
         """Извлекает аудио из видео."""
@@ -86,76 +151,220 @@ class VideoProcessor:
             str(output_path)
         ]
 
-        subprocess.run(cmd, capture_output=True, check=True)
+        proc.run(cmd, check=True)
         return output_path
 
-    def cut_video(self, video_path: Path, start: float, end: float, output_path: Path) -> Path:
-        """Вырезает фрагмент видео."""
-        duration = end - start
-
+    def _keyframe_before(self, video_path: Path, t: float) -> float:
+        """Находит ближайший ключевой кадр не позже момента t."""
         cmd = [
+            "ffprobe",
+            "-v", "quiet",
+            "-select_streams", "v:0",
+            "-show_entries", "packet=pts_time,flags",
+            "-of", "csv=p=0",
+            "-read_intervals", f"{max(0.0, t - 30):.3f}%{t:.3f}",
+            str(video_path)
+        ]
+
+        result = proc.run(cmd, text=True)
+
+        best = None
+        for line in result.stdout.splitlines():
+            parts = line.split(",")
+            if len(parts) < 2 or "K" not in parts[1]:
+                continue
+            try:
+                pts = float(parts[0])
+            except ValueError:
+                continue
+            if pts <= t and (best is None or pts > best):
+                best = pts
+
+        return best if best is not None else t
+
+    def cut_video(
+        self,
+        video_path: Path,
+        start: float,
+        end: float,
+        output_path: Path,
+        fast: bool = True,
+    ) -> Path:
+        """Вырезает фрагмент видео.
+
+        fast=True: stream-copy от ближайшего ключевого кадра — чистый
+        ремукс, в десятки раз быстрее перекодирования, но начало реза
+        прилипает к кейфрейму. fast=False: точный по кадру рез с
+        перекодированием видео.
+        """
+        if fast:
+            kf_start = self._keyframe_before(video_path, start)
+
+            copy_cmd = [
+                "ffmpeg", "-y",
+                "-ss", str(kf_start),
+                "-i", str(video_path),
+                "-t", str(end - kf_start),
+                "-c", "copy",
+                "-avoid_negative_ts", "make_zero",
+                str(output_path)
+            ]
+
+            result = proc.run(copy_cmd)
+            if result.returncode == 0 and output_path.exists():
+                return output_path
+
+        # Точное перекодирование. Грубый -ss до -i прыгает по кейфреймам
+        # (не декодируя всё до start), второй -ss добивает остаток точно
+        margin = min(start, 5.0)
+        base_cmd = [
             "ffmpeg", "-y",
-            "-ss", str(start),
+            "-ss", str(start - margin),
             "-i", str(video_path),
-            "-t", str(duration),
-            "-c:v", "libx264",
-            "-c:a", "aac",
-            "-avoid_negative_ts", "make_zero",
-            str(output_path)
+            "-ss", str(margin),
+            "-t", str(end - start),
+            *self.video_codec_args,
         ]
+        tail = ["-avoid_negative_ts", "make_zero", str(output_path)]
+
+        # Аудио стараемся не перекодировать
+        result = proc.run([*base_cmd, "-c:a", "copy", *tail])
+        if result.returncode == 0 and output_path.exists():
+            return output_path
 
-        subprocess.run(cmd, capture_output=True, check=True)
+        proc.run([*base_cmd, "-c:a", "aac", *tail], check=True)
         return output_path
 
-    def create_reaction_clip(
+    def cut_many(
         self,
-        image_path: Path,
-        audio_path: Path,
-        text: str,
-        video_info: VideoInfo,
-        output_path: Path,
-    ) -> Path:
-        """Создаёт reaction клип: картинка + текст + аудио."""
-        # Получаем длительность аудио
+        video_path: Path,
+        intervals: list[tuple[float, float]],
+        output_paths: list[Path],
+    ) -> list[Path]:
+        """Вырезает несколько фрагментов за один проход декодирования.
+
+        Вместо N запусков ffmpeg (каждый заново декодирует исходник)
+        строим один filter_complex с split/trim и пишем все выходы разом.
+        """
+        if len(intervals) != len(output_paths):
+            raise ValueError("intervals и output_paths должны совпадать по длине")
+
+        if not intervals:
+            return []
+
+        n = len(intervals)
+        filter_parts = [
+            f"[0:v]split={n}" + "".join(f"[v{i}]" for i in range(n)),
+            f"[0:a]asplit={n}" + "".join(f"[a{i}]" for i in range(n)),
+        ]
+        for i, (start, end) in enumerate(intervals):
+            filter_parts.append(
+                f"[v{i}]trim=start={start}:end={end},setpts=PTS-STARTPTS[vo{i}]"
+            )
+            filter_parts.append(
+                f"[a{i}]atrim=start={start}:end={end},asetpts=PTS-STARTPTS[ao{i}]"
+            )
+
+        cmd = [
+            "ffmpeg", "-y",
+            "-i", str(video_path),
+            "-filter_complex", ";".join(filter_parts),
+        ]
+        for i, output_path in enumerate(output_paths):
+            cmd += [
+                "-map", f"[vo{i}]",
+                "-map", f"[ao{i}]",
+                *self.video_codec_args,
+                "-c:a", "aac",
+                str(output_path),
+            ]
+
+        proc.run(cmd, check=True)
+        return list(output_paths)
+
+    def render_caption(self, text: str, video_info: VideoInfo, output_path: Path) -> Path:
+        """Растеризует подпись в прозрачный PNG.
+
+        Текст статичен на весь клип — рисуем его один раз через Pillow
+        вместо того, чтобы drawtext прогонял FreeType на каждом кадре.
+        """
+        from PIL import Image, ImageDraw, ImageFont
+
+        w, h = video_info.width, video_info.height
+        fontsize = min(w, h) // 10  # Размер шрифта относительно видео
+        font = ImageFont.truetype(FONT_PATH, fontsize)
+
+        img = Image.new("RGBA", (w, fontsize * 2), (0, 0, 0, 0))
+        draw = ImageDraw.Draw(img)
+        draw.text(
+            (w / 2, fontsize),
+            text,
+            font=font,
+            fill="white",
+            stroke_width=4,
+            stroke_fill="black",
+            anchor="mm",
+        )
+
+        img.save(output_path)
+        return output_path
+
+    @staticmethod
+    def _audio_duration(audio_path: Path) -> float:
+        """Длительность аудио файла в секундах."""
         probe_cmd = [
             "ffprobe", "-v", "quiet",
             "-show_entries", "format=duration",
             "-of", "csv=p=0",
             str(audio_path)
         ]
-        result = subprocess.run(probe_cmd, capture_output=True, text=True)
+        result = proc.run(probe_cmd, text=True)
         duration_str = result.stdout.strip()
         if not duration_str:
             raise ValueError(f"Не удалось получить длительность аудио: {audio_path}")
-        audio_duration = float(duration_str)
+        return float(duration_str)
 
-        # Масштабирование картинки под размер видео
+    @staticmethod
+    def _fit_filters(video_info: VideoInfo) -> tuple[str, str]:
+        """Фильтры вписывания картинки в кадр видео (scale + pad)."""
         w, h = video_info.width, video_info.height
 
         if video_info.is_horizontal:
             # Горизонтальное видео: картинка по высоте, pillarbox
-            scale_filter = f"scale=-1:{h}"
-            pad_filter = f"pad={w}:{h}:(ow-iw)/2:0:black"
-        else:
-            # Вертикальное видео: картинка по ширине, letterbox
-            scale_filter = f"scale={w}:-1"
-            pad_filter = f"pad={w}:{h}:0:(oh-ih)/2:black"
-
-        # Экранируем текст для FFmpeg
-        escaped_text = text.replace("'", "'\\''").replace(":", "\\:")
+            return f"scale=-1:{h}", f"pad={w}:{h}:(ow-iw)/2:0:black"
+        # Вертикальное видео: картинка по ширине, letterbox
+        return f"scale={w}:-1", f"pad={w}:{h}:0:(oh-ih)/2:black"
 
-        # Формируем фильтр
+    def create_reaction_clip(
+        self,
+        image_path: Path,
+        audio_path: Path,
+        text: str,
+        video_info: VideoInfo,
+        output_path: Path,
+        caption_path: Path | None = None,
+        threads: int | None = None,
+    ) -> Path:
+        """Создаёт reaction клип: картинка + текст + аудио.
+
+        threads ограничивает потоки энкодера — нужно при параллельном
+        рендере нескольких клипов (см. create_reaction_clips).
+        """
+        audio_duration = self._audio_duration(audio_path)
+        scale_filter, pad_filter = self._fit_filters(video_info)
+
+        # Текст всегда накладываем готовым PNG: Pillow рисует его один
+        # раз, ffmpeg остаётся дешёвый overlay вместо прогонки FreeType
+        # на каждом кадре (заодно без хрупкого экранирования drawtext)
+        if caption_path is None:
+            caption_path = self.render_caption(
+                text, video_info, self.temp_dir / f"{output_path.stem}_caption.png"
+            )
+
+        caption_inputs = ["-i", str(caption_path)]
         filter_complex = (
-            f"[0:v]{scale_filter},{pad_filter},"
-            f"drawtext=text='{escaped_text}':"
-            f"fontfile='{FONT_PATH}':"
-            f"fontsize={min(w, h) // 10}:"  # Размер шрифта относительно видео
-            f"fontcolor=white:"
-            f"borderw=4:"
-            f"bordercolor=black:"
-            f"x=(w-text_w)/2:"
-            f"y=h-h/6"
-            f"[v]"
+            f"[0:v]{scale_filter},{pad_filter}[bg];"
+            f"[bg][2:v]overlay=(W-w)/2:H-H/6[v]"
         )
 
         cmd = [
@@ -163,12 +372,14 @@ class VideoProcessor:
             "-loop", "1",
             "-i", str(image_path),
             "-i", str(audio_path),
+            *caption_inputs,
             "-filter_complex", filter_complex,
             "-map", "[v]",
             "-map", "1:a",
             "-t", str(audio_duration),
             "-r", str(int(video_info.fps)),
-            "-c:v", "libx264",
+            *(["-threads", str(threads)] if threads else []),
+            *self.video_codec_args,
             "-c:a", "aac",
             "-ar", "44100",
             "-ac", "2",  # Стерео
@@ -177,29 +388,189 @@ class VideoProcessor:
             str(output_path)
         ]
 
-        subprocess.run(cmd, capture_output=True, check=True)
+        proc.run(cmd, check=True)
         return output_path
 
+    def create_reaction_clips(
+        self,
+        items: list[tuple[Path, Path, str, VideoInfo, Path, Path | None]],
+    ) -> list[Path]:
+        """Рендерит пачку reaction клипов параллельно.
+
+        Клипы независимы, а x264 перестаёт масштабироваться после ~4
+        потоков — поэтому каждому ffmpeg даём -threads 4 и гоним
+        несколько процессов сразу. Пул потоковый: Python здесь только
+        запускает и ждёт дочерние процессы.
+        """
+        if not items:
+            return []
+
+        max_workers = max(1, min(len(items), (os.cpu_count() or 4) // 2))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(
+                lambda args: self.create_reaction_clip(*args, threads=4),
+                items,
+            ))
+
+    def create_reaction_montage(
+        self,
+        sources: list[tuple],
+        video_info: VideoInfo,
+        output_path: Path,
+    ) -> Path:
+        """Собирает весь ролик одним запуском ffmpeg.
+
+        Вместо N процессов на reaction клипы плюс финальной склейки —
+        один filter_complex, который рендерит каждую реакцию и тут же
+        конкатенирует всё: один старт ffmpeg, одна инициализация
+        энкодера, ни одного промежуточного mp4 на диске.
+
+        sources — элементы в порядке финального ролика:
+          ("clip", path) — готовый видеофайл (вырезанный фрагмент);
+          ("reaction", image_path, audio_path, caption_path) — reaction
+          сегмент, рендерится прямо в графе фильтров.
+        """
+        if not sources:
+            raise ValueError("Пустой список источников")
+
+        w, h = video_info.width, video_info.height
+        fps = int(video_info.fps)
+        scale_filter, pad_filter = self._fit_filters(video_info)
+
+        # Все ветки приводим к одному размеру/fps/формату — этого
+        # требует фильтр concat
+        norm_v = f"fps={fps},scale={w}:{h},format=yuv420p"
+        norm_a = "aresample=44100,aformat=sample_fmts=fltp:channel_layouts=stereo"
+
+        inputs: list[str] = []
+        filters: list[str] = []
+        concat_refs: list[str] = []
+        idx = 0
+
+        for n, src in enumerate(sources):
+            if src[0] == "clip":
+                _, clip_path = src
+                inputs += ["-i", str(clip_path)]
+                filters.append(f"[{idx}:v]{norm_v}[v{n}]")
+                filters.append(f"[{idx}:a]{norm_a}[a{n}]")
+                idx += 1
+            elif src[0] == "reaction":
+                _, image_path, audio_path, caption_path = src
+                duration = self._audio_duration(audio_path)
+                img, aud, cap = idx, idx + 1, idx + 2
+                inputs += [
+                    "-loop", "1", "-t", f"{duration:.3f}", "-i", str(image_path),
+                    "-i", str(audio_path),
+                    "-i", str(caption_path),
+                ]
+                filters.append(
+                    f"[{img}:v]{scale_filter},{pad_filter}[bg{n}];"
+                    f"[bg{n}][{cap}:v]overlay=(W-w)/2:H-H/6,{norm_v}[v{n}]"
+                )
+                filters.append(f"[{aud}:a]{norm_a}[a{n}]")
+                idx += 3
+            else:
+                raise ValueError(f"Неизвестный тип источника: {src[0]}")
+
+            concat_refs.append(f"[v{n}][a{n}]")
+
+        filters.append(
+            "".join(concat_refs) + f"concat=n={len(sources)}:v=1:a=1[v][a]"
+        )
+
+        # Граф на десятки сегментов легко превышает лимит длины argv —
+        # отдаём его файлом
+        filter_script = self.temp_dir / "montage_filters.txt"
+        filter_script.write_text(";\n".join(filters))
+
+        cmd = [
+            "ffmpeg", "-y",
+            *inputs,
+            "-filter_complex_script", str(filter_script),
+            "-map", "[v]",
+            "-map", "[a]",
+            *self.video_codec_args,
+            "-c:a", "aac",
+            "-ar", "44100",
+            "-ac", "2",
+            "-pix_fmt", "yuv420p",
+            str(output_path)
+        ]
+
+        proc.run(cmd, check=True)
+        return output_path
+
+    def _concat_copy_compatible(self, video_paths: list[Path]) -> bool:
+        """Проверяет, что клипы совпадают по кодекам и параметрам потоков."""
+        signatures = set()
+        for video_path in video_paths:
+            cmd = [
+                "ffprobe",
+                "-v", "quiet",
+                "-print_format", "json",
+                "-show_entries",
+                "stream=codec_type,codec_name,width,height,sample_rate,channels",
+                str(video_path),
+            ]
+            result = proc.run(cmd, text=True)
+            try:
+                data = json.loads(result.stdout)
+            except json.JSONDecodeError:
+                return False
+
+            signatures.add(tuple(sorted(
+                (
+                    s.get("codec_type"),
+                    s.get("codec_name"),
+                    s.get("width"),
+                    s.get("height"),
+                    s.get("sample_rate"),
+                    s.get("channels"),
+                )
+                for s in data.get("streams", [])
+            )))
+
+        return len(signatures) == 1
+
     def concat_videos(self, video_paths: list[Path], output_path: Path) -> Path:
-        """Склеивает видео в одно."""
+        """Склеивает видео в одно.
+
+        Наши клипы выходят из одного пайплайна с одинаковыми кодеками —
+        в этом случае concat demuxer склеивает stream-copy, без самого
+        дорогого шага (повторного кодирования). На разнородных входах
+        перекодируем как раньше.
+        """
         # Создаём файл со списком
         list_file = self.temp_dir / "concat_list.txt"
         with open(list_file, "w") as f:
             for video_path in video_paths:
                 f.write(f"file '{video_path}'\n")
 
+        if self._concat_copy_compatible(video_paths):
+            copy_cmd = [
+                "ffmpeg", "-y",
+                "-f", "concat",
+                "-safe", "0",
+                "-i", str(list_file),
+                "-c", "copy",
+                str(output_path)
+            ]
+            result = proc.run(copy_cmd)
+            if result.returncode == 0 and output_path.exists():
+                return output_path
+
         cmd = [
             "ffmpeg", "-y",
             "-f", "concat",
             "-safe", "0",
             "-i", str(list_file),
-            "-c:v", "libx264",
+            *self.video_codec_args,
             "-c:a", "aac",
             "-ar", "44100",  # Унифицируем sample rate
             str(output_path)
         ]
 
-        subprocess.run(cmd, capture_output=True, check=True)
+        proc.run(cmd, check=True)
         return output_path
 
     def cleanup(self):